@@ -65,3 +65,16 @@ export async function fetchPreview(datasetId: string) {
   if (!res.ok) throw new Error("Failed to load preview");
   return res.json();
 }
+
+export async function refineRun(runId: string): Promise<{ run_id: string; status: string }> {
+  const res = await fetch(`${API_BASE}/runs/${runId}/refine`, { method: "POST" });
+  if (!res.ok) throw new Error("Failed to refine run");
+  return res.json();
+}
+
+export async function fetchRun(runId: string) {
+  const res = await fetch(`${API_BASE}/runs/${runId}`, { cache: "no-store" });
+  if (res.status === 404) return null;
+  if (!res.ok) throw new Error("Failed to load run");
+  return res.json();
+}
@@ -7,7 +7,9 @@ import {
   API_BASE,
   Dataset,
   fetchDatasets,
+  fetchRun,
   fetchRuns,
+  refineRun,
   uploadDataset,
 } from "../../lib/api";
 import { Bar, BarChart, ResponsiveContainer, XAxis, YAxis, Tooltip } from "recharts";
@@ -15,10 +17,27 @@ import { Bar, BarChart, ResponsiveContainer, XAxis, YAxis, Tooltip } from "recha
 type ChatMessage = {
   role: "user" | "assistant";
   content: string;
-  table?: { columns: string[]; rows: Record<string, string>[] } | null;
+  table?: {
+    columns: string[];
+    rows: Record<string, string>[];
+    standard_errors?: Record<string, number | null>[];
+  } | null;
   chart?: { type: string; x: string; y: string; data: Record<string, string>[] } | null;
+  runId?: string;
+  approximate?: { fraction: number } | null;
 };
 
+const REFINE_POLL_MS = 2000;
+const REFINE_MAX_POLLS = 90;
+
+function formatCell(value: unknown, standardError?: number | null) {
+  const text = String(value ?? "");
+  if (standardError == null) {
+    return text;
+  }
+  return `${text} ± ${standardError.toLocaleString(undefined, { maximumSignificantDigits: 2 })}`;
+}
+
 type Run = {
   id: string;
   created_at: string;
@@ -120,6 +139,8 @@ export default function ProjectPage() {
               content: data.message,
               table: data.table,
               chart: data.chart,
+              runId: data.run_id,
+              approximate: data.approximate,
             };
             setMessages((prev) => [...prev, assistantMessage]);
             setStatus(null);
@@ -130,6 +151,26 @@ export default function ProjectPage() {
     }
   };
 
+  const refineMessage = async (runId: string) => {
+    setStatus("Refining to exact answer...");
+    try {
+      const { run_id: refinedId } = await refineRun(runId);
+      let refined = null;
+      for (let attempt = 0; !refined && attempt < REFINE_MAX_POLLS; attempt++) {
+        await new Promise((resolve) => setTimeout(resolve, REFINE_POLL_MS));
+        refined = await fetchRun(refinedId);
+      }
+      if (!refined) throw new Error("Refining timed out. Check recent runs later.");
+      const { message, table, chart } = refined.response;
+      setMessages((prev) => [...prev, { role: "assistant", content: message, table, chart }]);
+      setStatus(null);
+      void load();
+    } catch (err) {
+      setError((err as Error).message);
+      setStatus(null);
+    }
+  };
+
   const chartData = useMemo(() => {
     const latest = messages.findLast((message) => message.chart)?.chart;
     return latest?.data ?? [];
@@ -198,6 +239,20 @@ export default function ProjectPage() {
                 <div key={index}>
                   <p className="text-xs uppercase text-slate-400">{message.role}</p>
                   <p className="text-sm text-slate-100">{message.content}</p>
+                  {message.approximate && message.runId ? (
+                    <div className="mt-1 flex items-center gap-2 text-xs text-amber-300">
+                      <span>
+                        Approximate ({(message.approximate.fraction * 100).toFixed(1)}% sample; ±
+                        is one standard error)
+                      </span>
+                      <button
+                        className="text-indigo-300 underline"
+                        onClick={() => void refineMessage(message.runId as string)}
+                      >
+                        Refine to exact
+                      </button>
+                    </div>
+                  ) : null}
                   {message.table ? (
                     <div className="mt-2 overflow-x-auto rounded-lg border border-slate-800">
                       <table className="w-full text-xs text-slate-200">
@@ -215,7 +270,10 @@ export default function ProjectPage() {
                             <tr key={rowIndex} className="border-t border-slate-800">
                               {message.table?.columns.map((col) => (
                                 <td key={col} className="px-2 py-1">
-                                  {String(row[col] ?? "")}
+                                  {formatCell(
+                                    row[col],
+                                    message.table?.standard_errors?.[rowIndex]?.[col],
+                                  )}
                                 </td>
                               ))}
                             </tr>
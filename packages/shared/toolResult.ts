@@ -4,6 +4,7 @@ export const tableSchema = z.object({
   columns: z.array(z.string()),
   rows: z.array(z.record(z.any())),
   row_count: z.number().optional(),
+  standard_errors: z.array(z.record(z.number().nullable())).optional(),
 });
 
 export const chartSchema = z.object({
@@ -13,10 +14,21 @@ export const chartSchema = z.object({
   data: z.array(z.record(z.any())),
 });
 
+export const approximateSchema = z.object({
+  sample_rows: z.number(),
+  population_rows: z.number(),
+  fraction: z.number(),
+  scale_factor: z.number().nullable(),
+  dataset_id: z.string(),
+  sample_id: z.string(),
+  kind: z.string(),
+});
+
 export const toolResultSchema = z.object({
   message: z.string(),
   table: tableSchema.optional().nullable(),
   chart: chartSchema.optional().nullable(),
+  approximate: approximateSchema.optional().nullable(),
 });
 
 export type ToolResult = z.infer<typeof toolResultSchema>;
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import atexit
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import pandas as pd
+import pyarrow as pa
+
+from . import db
+
+CACHE_DIR = db.DATA_DIR / "cache"
+INDEX_NAME = "index.json"
+MAX_CACHE_BYTES = 2 * 1024**3
+# Datasets a process keeps mapped; the least recently read one is released beyond this.
+MAX_MAPPED = 8
+# Builds lock one of this many fixed lock files, so lock files do not accumulate per key.
+BUILD_LOCKS = 16
+
+# source path -> (cache key, memory-mapped table) for datasets this process holds a reference to,
+# ordered from least to most recently read.
+_mapped: OrderedDict[str, tuple[str, pa.Table]] = OrderedDict()
+# Guards _mapped, which request handlers and background tasks share across threads.
+_mapped_lock = threading.Lock()
+
+
+def _cache_key(path: str) -> str:
+    stat = os.stat(path)
+    raw = f"{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+@contextmanager
+def _file_lock(name: str) -> Iterator[None]:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(CACHE_DIR / name, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+@contextmanager
+def _locked_index() -> Iterator[dict[str, Any]]:
+    with _file_lock("index.lock"):
+        index_path = CACHE_DIR / INDEX_NAME
+        index = json.loads(index_path.read_text()) if index_path.exists() else {}
+        yield index
+        tmp_path = index_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(index))
+        os.replace(tmp_path, index_path)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _evict(index: dict[str, Any], keep: str | None = None) -> None:
+    for entry in index.values():
+        entry["refs"] = [pid for pid in entry["refs"] if _pid_alive(pid)]
+    source = index[keep]["source"] if keep else None
+    idle = sorted(
+        (key for key, entry in index.items() if not entry["refs"] and key != keep),
+        key=lambda key: index[key]["last_used"],
+    )
+    total = sum(entry["size"] for entry in index.values())
+    # Superseded versions of the same source are always dropped; others only when over budget.
+    for key in idle:
+        entry = index[key]
+        superseded = source is not None and entry["source"] == source
+        if not superseded and total <= MAX_CACHE_BYTES:
+            continue
+        index.pop(key)
+        (CACHE_DIR / entry["file"]).unlink(missing_ok=True)
+        total -= entry["size"]
+
+
+def _export(key: str, table: pa.Table) -> Path:
+    path = CACHE_DIR / f"{key}.arrow"
+    tmp_path = CACHE_DIR / f"{key}.arrow.{os.getpid()}.tmp"
+    with pa.OSFile(str(tmp_path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _map(path: Path) -> pa.Table:
+    source = pa.memory_map(str(path), "r")
+    return pa.ipc.open_file(source).read_all()
+
+
+def _register(key: str, source: str, file: Path | None = None) -> Path | None:
+    with _locked_index() as index:
+        entry = index.get(key)
+        if entry is None and file is not None:
+            entry = {
+                "source": source,
+                "file": file.name,
+                "size": file.stat().st_size,
+                "refs": [],
+                "last_used": 0.0,
+            }
+            index[key] = entry
+        if entry is None or not (CACHE_DIR / entry["file"]).exists():
+            index.pop(key, None)
+            return None
+        entry["refs"] = sorted(set(entry["refs"]) | {os.getpid()})
+        entry["last_used"] = time.time()
+        _evict(index, keep=key)
+        return CACHE_DIR / entry["file"]
+
+
+def _release(keys: list[str]) -> None:
+    if not keys:
+        return
+    with _locked_index() as index:
+        for key in keys:
+            if key in index:
+                index[key]["refs"] = [pid for pid in index[key]["refs"] if pid != os.getpid()]
+        _evict(index)
+
+
+def read_cached(path: str, parse: Callable[[str], pd.DataFrame]) -> pd.DataFrame:
+    """Return the dataset at ``path`` from the shared Arrow IPC cache, parsing it at most once.
+
+    Tables are exported as Arrow IPC files under ``CACHE_DIR`` and memory-mapped, so every
+    worker process shares the same pages. Cached frames are backed by that shared memory and
+    are read-only; callers that modify a frame must ``copy()`` it first. Datasets that Arrow
+    cannot represent exactly, including those with non-string column names, are parsed
+    directly and not cached.
+    """
+    source = os.path.abspath(path)
+    key = _cache_key(path)
+    with _mapped_lock:
+        held = _mapped.get(source)
+        if held and held[0] == key:
+            _mapped.move_to_end(source)
+        elif held:
+            del _mapped[source]
+    if held and held[0] == key:
+        return held[1].to_pandas(split_blocks=True)
+    if held:
+        _release([held[0]])
+
+    with _file_lock(f"build-{int(key, 16) % BUILD_LOCKS}.lock"):
+        file = _register(key, source)
+        if file is None:
+            df = parse(path)
+            if not all(isinstance(col, str) for col in df.columns):
+                return df
+            try:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                return df
+            file = _register(key, source, _export(key, table))
+    if file is None:
+        return parse(path)
+    table = _map(file)
+    evicted = []
+    with _mapped_lock:
+        replaced = _mapped.pop(source, None)
+        if replaced and replaced[0] != key:
+            evicted.append(replaced[0])
+        _mapped[source] = (key, table)
+        while len(_mapped) > MAX_MAPPED:
+            _, (evicted_key, _) = _mapped.popitem(last=False)
+            evicted.append(evicted_key)
+    _release(evicted)
+    return table.to_pandas(split_blocks=True)
+
+
+@atexit.register
+def _release_all() -> None:
+    with _mapped_lock:
+        keys = [key for key, _ in _mapped.values()]
+        _mapped.clear()
+    try:
+        _release(keys)
+    except OSError:
+        pass
@@ -30,6 +30,19 @@ class Dataset:
     profile_json: str
 
 
+@dataclass
+class Sample:
+    id: str
+    dataset_id: str
+    kind: str
+    fraction: float
+    strata_column: str | None
+    path: str
+    row_count: int
+    weights_json: str | None
+    source_json: str
+
+
 @dataclass
 class Run:
     id: str
@@ -72,6 +85,22 @@ def init_db() -> None:
         )
         """
     )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS samples (
+            id TEXT PRIMARY KEY,
+            dataset_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            fraction REAL NOT NULL,
+            strata_column TEXT,
+            path TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            weights_json TEXT,
+            source_json TEXT NOT NULL,
+            FOREIGN KEY(dataset_id) REFERENCES datasets(id)
+        )
+        """
+    )
     cursor.execute(
         """
         CREATE TABLE IF NOT EXISTS runs (
@@ -148,6 +177,16 @@ def create_dataset(
     )
 
 
+def update_dataset_profile(dataset_id: str, profile: dict[str, Any]) -> None:
+    conn = _connect()
+    conn.execute(
+        "UPDATE datasets SET profile_json = ? WHERE id = ?",
+        (json.dumps(profile), dataset_id),
+    )
+    conn.commit()
+    conn.close()
+
+
 def list_datasets(project_id: str) -> list[Dataset]:
     conn = _connect()
     rows = conn.execute(
@@ -165,6 +204,65 @@ def get_dataset(dataset_id: str) -> Dataset | None:
     return Dataset(**dict(row)) if row else None
 
 
+def create_sample(
+    sample_id: str,
+    dataset_id: str,
+    kind: str,
+    fraction: float,
+    strata_column: str | None,
+    path: str,
+    row_count: int,
+    source: dict[str, Any],
+    weights: dict[str, float] | None = None,
+) -> Sample:
+    conn = _connect()
+    weights_json = json.dumps(weights) if weights is not None else None
+    source_json = json.dumps(source)
+    conn.execute(
+        """
+        INSERT INTO samples (
+            id, dataset_id, kind, fraction, strata_column, path, row_count, weights_json,
+            source_json
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            sample_id,
+            dataset_id,
+            kind,
+            fraction,
+            strata_column,
+            path,
+            row_count,
+            weights_json,
+            source_json,
+        ),
+    )
+    conn.commit()
+    conn.close()
+    return Sample(
+        id=sample_id,
+        dataset_id=dataset_id,
+        kind=kind,
+        fraction=fraction,
+        strata_column=strata_column,
+        path=path,
+        row_count=row_count,
+        weights_json=weights_json,
+        source_json=source_json,
+    )
+
+
+def list_samples(dataset_id: str) -> list[Sample]:
+    conn = _connect()
+    rows = conn.execute(
+        "SELECT * FROM samples WHERE dataset_id = ? ORDER BY fraction DESC",
+        (dataset_id,),
+    ).fetchall()
+    conn.close()
+    return [Sample(**dict(row)) for row in rows]
+
+
 def create_run(
     run_id: str,
     project_id: str,
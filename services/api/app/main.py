@@ -6,16 +6,25 @@ import uuid
 from pathlib import Path
 from typing import Any, AsyncGenerator
 
-from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi import BackgroundTasks, FastAPI, File, HTTPException, UploadFile
 import pandas as pd
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from sse_starlette.sse import EventSourceResponse
 
-from . import db
+from . import db, sampling
 from .llm import DEVELOPER_PROMPT, FEW_SHOTS, SYSTEM_PROMPT, stream_ollama
-from .profiling import preview_dataframe, profile_dataframe, read_dataset
-from .tools import QueryError, build_chart_spec, run_sql, summarize_dataframe, tool_result_payload
+from .profiling import preview_dataframe, profile_dataframe, profile_is_current, read_dataset
+from .tools import (
+    QueryError,
+    SQLError,
+    build_chart_spec,
+    run_sql,
+    summarize_profile,
+    tool_result_payload,
+)
+
+MAX_SQL_ATTEMPTS = 2
 
 app = FastAPI(title="LLM Data Analytics API", version="0.1.0")
 
@@ -42,6 +51,7 @@ class ChatSettings(BaseModel):
     provider: str = "ollama"
     model: str = "llama3.1:8b"
     temperature: float = 0.2
+    use_samples: bool = True
 
 
 class ChatRequest(BaseModel):
@@ -104,9 +114,12 @@ async def upload_dataset(project_id: str, file: UploadFile = File(...)) -> dict[
     content = await file.read()
     path = db.write_uploaded_file(project_id, file.filename, content)
     df = read_dataset(str(path))
-    profile = profile_dataframe(df)
+    profile = profile_dataframe(df, str(path))
+    samples = sampling.build_samples(df, profile, str(path))
     dataset_id = str(uuid.uuid4())
     dataset = db.create_dataset(dataset_id, project_id, file.filename, str(path), profile)
+    for sample in samples:
+        db.create_sample(str(uuid.uuid4()), dataset_id, **sample)
     return {
         "id": dataset.id,
         "project_id": dataset.project_id,
@@ -149,6 +162,53 @@ async def list_runs(project_id: str) -> list[dict[str, Any]]:
     ]
 
 
+@app.get("/runs/{run_id}")
+async def get_run(run_id: str) -> dict[str, Any]:
+    run = db.get_run(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return {
+        "id": run.id,
+        "project_id": run.project_id,
+        "run_type": run.run_type,
+        "created_at": run.created_at,
+        "request": json.loads(run.request_json),
+        "response": json.loads(run.response_json),
+    }
+
+
+@app.post("/runs/{run_id}/refine")
+async def refine_run(run_id: str, background_tasks: BackgroundTasks) -> dict[str, Any]:
+    run = db.get_run(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    approximate = json.loads(run.response_json).get("approximate")
+    if not approximate:
+        raise HTTPException(status_code=400, detail="Run is already exact")
+    refined_id = str(uuid.uuid4())
+    background_tasks.add_task(_refine_run, run, approximate, refined_id)
+    return {"run_id": refined_id, "status": "pending"}
+
+
+def _refine_run(run: db.Run, approximate: dict[str, Any], refined_id: str) -> None:
+    dataset = db.get_dataset(approximate["dataset_id"])
+    tool = approximate["tool"]
+    if not dataset:
+        response = tool_result_payload("The dataset for this run no longer exists.")
+    else:
+        try:
+            df = read_dataset(dataset.path)
+            response = _run_tool(df, tool["name"], tool["arguments"])
+        except QueryError as exc:
+            response = tool_result_payload(str(exc))
+        except Exception as exc:
+            # Always record a run so clients polling for the refinement can stop waiting.
+            response = tool_result_payload(f"Refining to the exact answer failed: {exc}")
+        if response is None:
+            response = tool_result_payload("This run cannot be refined.")
+    db.create_run(refined_id, run.project_id, "refine", {"run_id": run.id}, response)
+
+
 @app.get("/runs/{run_id}/export")
 async def export_run(run_id: str) -> dict[str, Any]:
     run = db.get_run(run_id)
@@ -174,6 +234,43 @@ async def export_run(run_id: str) -> dict[str, Any]:
     return {"markdown": markdown}
 
 
+def _run_tool(
+    df: pd.DataFrame,
+    name: str,
+    args: dict[str, Any],
+    sample: db.Sample | None = None,
+    population_rows: int = 0,
+) -> dict[str, Any] | None:
+    if name == "run_sql":
+        query = args.get("query", "")
+        if sample:
+            result = run_sql(df, sampling.sampled_query(query))
+            result["scaled_columns"] = sampling.scale_result(result, sample, query, population_rows)
+        else:
+            result = run_sql(df, query)
+        message = "Here is the result of the SQL query."
+        chart = None
+        if result["rows"]:
+            chart = build_chart_spec(
+                pd.DataFrame(result["rows"]),
+                result["columns"][0],
+                result["columns"][-1],
+            )
+        return tool_result_payload(message, result, chart)
+    if name == "plot":
+        chart = build_chart_spec(df, args.get("x"), args.get("y"))
+        return tool_result_payload("Chart spec generated.", None, chart)
+    return None
+
+
+def _summarize_dataset(dataset: db.Dataset) -> dict[str, Any]:
+    profile = db.load_profile(dataset.profile_json)
+    if not profile_is_current(profile, dataset.path):
+        profile = profile_dataframe(read_dataset(dataset.path), dataset.path)
+        db.update_dataset_profile(dataset.id, profile)
+    return summarize_profile(profile)
+
+
 async def _tool_loop(request: ChatRequest) -> dict[str, Any]:
     dataset = None
     if request.dataset_id:
@@ -182,12 +279,21 @@ async def _tool_loop(request: ChatRequest) -> dict[str, Any]:
         return tool_result_payload(
             "Please upload and select a dataset before asking data questions.",
         )
-    df = read_dataset(dataset.path)
-    schema = {"columns": list(df.columns)}
+    profile = db.load_profile(dataset.profile_json)
+    samples = []
+    if request.settings.use_samples:
+        samples = sampling.current_samples(db.list_samples(dataset.id), dataset.path)
+    schema = {"columns": [col["name"] for col in profile["columns"]]}
     system_context = (
         f"Dataset schema: {schema}.\n"
-        f"Profile summary: {db.load_profile(dataset.profile_json)}"
+        f"Profile summary: {profile}"
     )
+    if samples:
+        # COUNT and SUM results are scaled to the full dataset by the server, not the model.
+        system_context += (
+            f"\nTools run on a {samples[0].fraction:.1%} sample of the dataset. "
+            "Write queries as if against the full dataset; do not rescale results yourself."
+        )
     messages = [
         {"role": "system", "content": SYSTEM_PROMPT},
         {"role": "system", "content": DEVELOPER_PROMPT},
@@ -196,49 +302,64 @@ async def _tool_loop(request: ChatRequest) -> dict[str, Any]:
     messages.extend(FEW_SHOTS)
     messages.extend([m.model_dump() for m in request.messages])
 
-    model_text = ""
-    try:
-        async for token in stream_ollama(
-            messages, request.settings.model, request.settings.temperature
-        ):
-            model_text += token
-    except Exception:
-        return tool_result_payload(
-            "Ollama is not reachable. Please start Ollama and download the configured model.",
-        )
-
-    try:
-        parsed = json.loads(model_text.strip())
-    except json.JSONDecodeError:
-        return tool_result_payload(
-            "The model response could not be parsed. Try rephrasing your question.",
-        )
+    for attempt in range(MAX_SQL_ATTEMPTS):
+        model_text = ""
+        try:
+            async for token in stream_ollama(
+                messages, request.settings.model, request.settings.temperature
+            ):
+                model_text += token
+        except Exception:
+            return tool_result_payload(
+                "Ollama is not reachable. Please start Ollama and download the configured model.",
+            )
 
-    if parsed.get("type") == "tool":
-        name = parsed.get("name")
-        args = parsed.get("arguments") or {}
         try:
-            if name == "run_sql":
-                result = run_sql(df, args.get("query", ""))
-                message = "Here is the result of the SQL query."
-                chart = None
-                if result["columns"]:
-                    chart = build_chart_spec(
-                        pd.DataFrame(result["rows"]), result["columns"][0], result["columns"][-1]
-                    )
-                return tool_result_payload(message, result, chart)
+            parsed = json.loads(model_text.strip())
+        except json.JSONDecodeError:
+            return tool_result_payload(
+                "The model response could not be parsed. Try rephrasing your question.",
+            )
+
+        if parsed.get("type") == "tool":
+            name = parsed.get("name")
+            args = parsed.get("arguments") or {}
             if name == "summarize_dataframe":
-                summary = summarize_dataframe(df)
+                # Answered from stats stored at profiling time (quartiles are t-digest
+                # approximations), so no sample or full scan is needed.
+                summary = _summarize_dataset(dataset)
                 return tool_result_payload("Summary stats computed.", summary)
-            if name == "plot":
-                chart = build_chart_spec(df, args.get("x"), args.get("y"))
-                return tool_result_payload("Chart spec generated.", None, chart)
-        except QueryError as exc:
-            return tool_result_payload(str(exc))
-    if parsed.get("type") == "final":
-        return tool_result_payload(
-            parsed.get("message", ""), parsed.get("table"), parsed.get("chart")
-        )
+            sample = sampling.choose_sample(samples, str(args.get("query", "")))
+            df = read_dataset(sample.path if sample else dataset.path)
+            try:
+                response = _run_tool(df, name, args, sample, profile["row_count"])
+            except QueryError as exc:
+                if not isinstance(exc, SQLError) or attempt == MAX_SQL_ATTEMPTS - 1:
+                    return tool_result_payload(str(exc))
+                # Let the model revise a rejected query instead of surfacing the error right away.
+                messages.append({"role": "assistant", "content": model_text})
+                feedback = f"The run_sql call failed: {exc} Send a revised query."
+                messages.append({"role": "user", "content": feedback})
+                continue
+            if response is not None:
+                if sample:
+                    response["approximate"] = {
+                        **sampling.sample_summary(sample.row_count, profile["row_count"]),
+                        "dataset_id": dataset.id,
+                        "sample_id": sample.id,
+                        "kind": sample.kind,
+                        "tool": {"name": name, "arguments": args},
+                    }
+                    response["message"] += (
+                        f" (approximate, from a {sample.fraction:.1%} sample; "
+                        "refine to get the exact answer)"
+                    )
+                return response
+        if parsed.get("type") == "final":
+            return tool_result_payload(
+                parsed.get("message", ""), parsed.get("table"), parsed.get("chart")
+            )
+        break
     return tool_result_payload("No actionable response from the model.")
 
 
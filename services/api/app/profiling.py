@@ -1,11 +1,24 @@
 from __future__ import annotations
 
+import math
+import os
+
+import duckdb
 import pandas as pd
 
+from .cache import read_cached
+
 ALLOWED_EXTENSIONS = {".csv", ".xlsx", ".json", ".parquet"}
+QUANTILES = (0.25, 0.5, 0.75)
 
 
 def read_dataset(path: str, max_rows: int | None = None) -> pd.DataFrame:
+    if max_rows is None:
+        return read_cached(path, _parse_dataset)
+    return _parse_dataset(path, max_rows)
+
+
+def _parse_dataset(path: str, max_rows: int | None = None) -> pd.DataFrame:
     suffix = path.lower().rsplit(".", 1)
     ext = f".{suffix[1]}" if len(suffix) == 2 else ""
     if ext not in ALLOWED_EXTENSIONS:
@@ -21,8 +34,48 @@ def read_dataset(path: str, max_rows: int | None = None) -> pd.DataFrame:
     raise ValueError(f"Unsupported file type: {ext}")
 
 
-def profile_dataframe(df: pd.DataFrame) -> dict:
+def _float_or_none(value) -> float | None:
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def _quantile_sketches(df: pd.DataFrame) -> dict:
+    """Approximate quartiles per numeric column via DuckDB's t-digest ``approx_quantile``."""
+    numeric = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
+    if not numeric or df.empty:
+        return {}
+    frame = df[numeric].set_axis([f"c{i}" for i in range(len(numeric))], axis=1)
+    points = ", ".join(str(q) for q in QUANTILES)
+    select = ", ".join(
+        f"approx_quantile(CAST(c{i} AS DOUBLE), [{points}])" for i in range(len(numeric))
+    )
+    conn = duckdb.connect(database=":memory:")
+    conn.register("dataset", frame)
+    try:
+        row = conn.execute(f"SELECT {select} FROM dataset").fetchone()
+    finally:
+        conn.close()
+    return {
+        col: {f"{q:.0%}": value for q, value in zip(QUANTILES, values)} if values else {}
+        for col, values in zip(numeric, row)
+    }
+
+
+def source_fingerprint(path: str) -> dict:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def profile_is_current(profile: dict, path: str) -> bool:
+    try:
+        return profile.get("source") == source_fingerprint(path)
+    except OSError:
+        return False
+
+
+def profile_dataframe(df: pd.DataFrame, path: str | None = None) -> dict:
     row_count = len(df)
+    quantiles = _quantile_sketches(df)
     columns = []
     for col in df.columns:
         series = df[col]
@@ -36,9 +89,12 @@ def profile_dataframe(df: pd.DataFrame) -> dict:
         stats = {}
         if pd.api.types.is_numeric_dtype(series):
             stats = {
+                "count": row_count - missing,
                 "min": float(series.min()) if not series.empty else None,
                 "max": float(series.max()) if not series.empty else None,
                 "mean": float(series.mean()) if not series.empty else None,
+                "std": _float_or_none(series.std()) if not series.empty else None,
+                "quantiles": quantiles.get(col, {}),
             }
         columns.append(
             {
@@ -57,6 +113,7 @@ def profile_dataframe(df: pd.DataFrame) -> dict:
     return {
         "row_count": row_count,
         "column_count": len(df.columns),
+        "source": source_fingerprint(path) if path else None,
         "columns": columns,
         "data_health": {
             "missing_total": missing_total,
@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import glob
+import json
+import math
+import numbers
+from pathlib import Path
+from typing import Any
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+
+from .profiling import source_fingerprint
+
+SAMPLE_FRACTIONS = (0.01, 0.001)
+# Fractions that would yield fewer rows than this are skipped; small datasets stay exact.
+MIN_SAMPLE_ROWS = 1_000
+MAX_STRATA = 20
+SAMPLE_SEED = 0
+# Aggregates whose value grows with the number of rows and so must be scaled up from a sample.
+SCALED_AGGREGATES = {"count", "count_star", "sum"}
+# Prefix of the hidden sum-of-squares columns sampled_query adds for standard errors.
+SQUARES_PREFIX = "__squares_"
+# Aggregates a sampled query may use: scaled ones, plus ones a sample estimates unscaled.
+SAMPLED_AGGREGATES = SCALED_AGGREGATES | {"avg", "min", "max"}
+
+
+def pick_strata_column(profile: dict[str, Any]) -> str | None:
+    candidates = [
+        col
+        for col in profile.get("columns", [])
+        if 2 <= col["unique"] <= MAX_STRATA and not col["dtype"].startswith(("float", "datetime"))
+    ]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda col: (col["unique"], col["missing"]))["name"]
+
+
+def _stratum_key(value: Any) -> str:
+    # run_sql fills missing values with "", so a missing stratum is keyed the same way.
+    return "" if pd.isna(value) else str(value)
+
+
+def _stratified(
+    df: pd.DataFrame, column: str, fraction: float
+) -> tuple[pd.DataFrame, dict[str, float]]:
+    # Proportional allocation, rounded up so every stratum keeps at least one row. Small strata
+    # are oversampled as a result, so each stratum carries its own weight.
+    parts = []
+    weights = {}
+    for value, group in df.groupby(column, dropna=False, sort=False):
+        part = group.sample(n=math.ceil(len(group) * fraction), random_state=SAMPLE_SEED)
+        parts.append(part)
+        weights[_stratum_key(value)] = len(group) / len(part)
+    return pd.concat(parts), weights
+
+
+def build_samples(df: pd.DataFrame, profile: dict[str, Any], path: str) -> list[dict[str, Any]]:
+    """Write sample parquet files next to ``path``.
+
+    Datasets that Arrow cannot store, such as object columns with mixed types, get no samples.
+    """
+    source = Path(path)
+    # Drop samples of an earlier upload to the same path; their rows no longer match the source.
+    for kind in ("uniform", "stratified"):
+        for stale in source.parent.glob(f"{glob.escape(source.stem)}.{kind}-*.parquet"):
+            stale.unlink(missing_ok=True)
+    fingerprint = source_fingerprint(path)
+    strata = pick_strata_column(profile)
+    samples = []
+    for fraction in SAMPLE_FRACTIONS:
+        if len(df) * fraction < MIN_SAMPLE_ROWS:
+            continue
+        variants = [("uniform", None, df.sample(frac=fraction, random_state=SAMPLE_SEED), None)]
+        if strata:
+            variants.append(("stratified", strata, *_stratified(df, strata, fraction)))
+        for kind, column, sample, weights in variants:
+            sample_path = source.with_name(f"{source.stem}.{kind}-{fraction:g}.parquet")
+            try:
+                sample.reset_index(drop=True).to_parquet(sample_path, index=False)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                for written in samples:
+                    Path(written["path"]).unlink(missing_ok=True)
+                sample_path.unlink(missing_ok=True)
+                return []
+            samples.append(
+                {
+                    "kind": kind,
+                    "fraction": fraction,
+                    "strata_column": column,
+                    "path": str(sample_path),
+                    "row_count": len(sample),
+                    "source": fingerprint,
+                    "weights": weights,
+                }
+            )
+    return samples
+
+
+def current_samples(samples: list[Any], path: str) -> list[Any]:
+    """Drop samples taken from an earlier version of the file at ``path``."""
+    try:
+        fingerprint = source_fingerprint(path)
+    except OSError:
+        return []
+    return [
+        sample
+        for sample in samples
+        if json.loads(sample.source_json) == fingerprint and Path(sample.path).exists()
+    ]
+
+
+def _serialize(query: str) -> dict[str, Any] | None:
+    """Return DuckDB's parse tree for a single plain SELECT, or None for anything else."""
+    conn = duckdb.connect(database=":memory:")
+    try:
+        tree = json.loads(conn.execute("SELECT json_serialize_sql(?)", [query]).fetchone()[0])
+    except duckdb.Error:
+        return None
+    finally:
+        conn.close()
+    if tree.get("error") or len(tree["statements"]) != 1:
+        return None
+    return tree if tree["statements"][0]["node"].get("type") == "SELECT_NODE" else None
+
+
+def _parse_select(query: str) -> dict[str, Any] | None:
+    tree = _serialize(query)
+    return tree["statements"][0]["node"] if tree else None
+
+
+def _is_column(expression: dict[str, Any], column: str) -> bool:
+    return expression.get("class") == "COLUMN_REF" and expression["column_names"][-1] == column
+
+
+def _strata_position(node: dict[str, Any], column: str) -> int | None:
+    """Output position of ``column`` when the query groups by it, else None."""
+    if not any(_is_column(expr, column) for expr in node.get("group_expressions", [])):
+        return None
+    positions = [i for i, expr in enumerate(node["select_list"]) if _is_column(expr, column)]
+    return positions[0] if positions else None
+
+
+def _is_aggregate(expression: dict[str, Any]) -> bool:
+    return (
+        expression.get("class") == "FUNCTION"
+        and expression.get("function_name") in SAMPLED_AGGREGATES
+        and not expression.get("distinct")
+        and expression.get("filter") is None
+        and all(
+            child.get("class") in ("COLUMN_REF", "CONSTANT") for child in expression["children"]
+        )
+    )
+
+
+def _is_scalable(node: dict[str, Any]) -> bool:
+    """Whether ``scale_result`` can turn the query's result on a sample into a full-data estimate.
+
+    That holds for a single SELECT over ``dataset`` whose select list has only grouped columns
+    and plain COUNT, SUM, AVG, MIN or MAX calls: no HAVING, DISTINCT, subqueries or expressions
+    wrapped around an aggregate. Anything else, such as row lookups, must run on the full data.
+    """
+    table = node.get("from_table") or {}
+    if table.get("type") != "BASE_TABLE" or table.get("table_name") != "dataset":
+        return False
+    if node.get("having") or node["cte_map"]["map"] or len(node.get("group_sets", [])) > 1:
+        return False
+    if any(modifier.get("type") == "DISTINCT_MODIFIER" for modifier in node["modifiers"]):
+        return False
+    if '"SUBQUERY"' in json.dumps(node):
+        return False
+    groups = node.get("group_expressions", [])
+    if not all(expr.get("class") == "COLUMN_REF" for expr in groups):
+        return False
+    grouped = {expr["column_names"][-1] for expr in groups}
+    select = node["select_list"]
+    if not any(_is_aggregate(expr) for expr in select):
+        return False
+    return all(
+        _is_aggregate(expr)
+        or (expr.get("class") == "COLUMN_REF" and expr["column_names"][-1] in grouped)
+        for expr in select
+    )
+
+
+def choose_sample(samples: list[Any], query: str = "") -> Any | None:
+    """Pick the largest sample a query can run on, or None when it must see the full dataset.
+
+    Only queries ``scale_result`` can scale are sampled. A stratified sample is preferred when
+    results are grouped by its strata column.
+    """
+    node = _parse_select(query) if query else None
+    if not samples or not node or not _is_scalable(node):
+        return None
+    fraction = max(sample.fraction for sample in samples)
+    largest = [sample for sample in samples if sample.fraction == fraction]
+    for sample in largest:
+        if sample.kind == "stratified" and _strata_position(node, sample.strata_column) is not None:
+            return sample
+    return next((sample for sample in largest if sample.kind == "uniform"), None)
+
+
+def _is_scaled(expression: dict[str, Any]) -> bool:
+    return (
+        expression.get("class") == "FUNCTION"
+        and expression.get("function_name") in SCALED_AGGREGATES
+        and not expression.get("distinct")
+    )
+
+
+def _substitute(node: Any, expression: dict[str, Any]) -> Any:
+    if isinstance(node, dict):
+        if node.get("class") == "COLUMN_REF" and node["column_names"] == ["__value"]:
+            return expression
+        return {key: _substitute(value, expression) for key, value in node.items()}
+    if isinstance(node, list):
+        return [_substitute(value, expression) for value in node]
+    return node
+
+
+def sampled_query(query: str) -> str:
+    """Return ``query`` with the hidden columns ``scale_result`` needs for standard errors.
+
+    Each scaled SUM gets a ``sum(x * x)`` column, named with ``SQUARES_PREFIX`` and its position.
+    """
+    tree = _serialize(query)
+    if not tree:
+        return query
+    select = tree["statements"][0]["node"]["select_list"]
+    template = _parse_select('SELECT sum(CAST("__value" AS DOUBLE) * CAST("__value" AS DOUBLE))')
+    squares = []
+    for i, expr in enumerate(select):
+        if _is_scaled(expr) and expr["function_name"] == "sum" and len(expr["children"]) == 1:
+            square = _substitute(template["select_list"][0], expr["children"][0])
+            squares.append({**square, "alias": f"{SQUARES_PREFIX}{i}"})
+    if not squares:
+        return query
+    select.extend(squares)
+    conn = duckdb.connect(database=":memory:")
+    try:
+        return conn.execute("SELECT json_deserialize_sql(?)", [json.dumps(tree)]).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+def scale_result(
+    result: dict[str, Any], sample: Any, query: str, population_rows: int
+) -> list[str]:
+    """Scale COUNT and SUM columns of a ``run_sql`` result from ``sample`` to the full dataset.
+
+    Only top-level, non-DISTINCT aggregates in an explicit select list are scaled. Rows from a
+    stratified sample use their stratum's weight. Returns the names of the scaled columns.
+
+    Sets ``result["standard_errors"]`` to one ``{column: standard error}`` dict per row. Each
+    row is treated as sampled independently with probability ``1 / w`` for its weight ``w``, so
+    a scaled total has variance ``w * (w - 1) * sum(x * x)`` over the matching sample rows (for
+    COUNT, ``x`` is 1). SUM errors need the hidden columns from ``sampled_query``, which are
+    removed here; without them they are None.
+    """
+    hidden = [col for col in result["columns"] if col.startswith(SQUARES_PREFIX)]
+    squares = [{col: row.pop(col) for col in hidden} for row in result["rows"]]
+    result["columns"] = [col for col in result["columns"] if col not in hidden]
+    result["standard_errors"] = [{} for _ in result["rows"]]
+    node = _parse_select(query)
+    if not node or any(expr.get("class") == "STAR" for expr in node["select_list"]):
+        return []
+    if len(node["select_list"]) != len(result["columns"]):
+        return []
+    positions = [i for i, expr in enumerate(node["select_list"]) if _is_scaled(expr)]
+    if not positions:
+        return []
+    weights = json.loads(sample.weights_json) if sample.weights_json else None
+    position = _strata_position(node, sample.strata_column) if weights else None
+    strata = result["columns"][position] if position is not None else None
+    uniform_weight = population_rows / sample.row_count
+    for row, row_squares, errors in zip(result["rows"], squares, result["standard_errors"]):
+        weight = weights.get(_stratum_key(row[strata]), 0.0) if strata else uniform_weight
+        for i in positions:
+            column = result["columns"][i]
+            value = row[column]
+            if not _is_number(value):
+                continue
+            if node["select_list"][i]["function_name"] == "sum":
+                square_sum = row_squares.get(f"{SQUARES_PREFIX}{i}")
+            else:
+                square_sum = value
+            errors[column] = (
+                math.sqrt(max(weight * (weight - 1), 0.0) * square_sum)
+                if _is_number(square_sum)
+                else None
+            )
+            scaled = value * weight
+            row[column] = round(scaled) if isinstance(value, numbers.Integral) else scaled
+    return [result["columns"][i] for i in positions]
+
+
+def sample_summary(sample_rows: int, population_rows: int) -> dict[str, Any]:
+    fraction = sample_rows / population_rows if population_rows else 1.0
+    return {
+        "sample_rows": sample_rows,
+        "population_rows": population_rows,
+        "fraction": round(fraction, 6),
+        "scale_factor": round(1 / fraction, 2) if fraction else None,
+    }
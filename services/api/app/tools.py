@@ -1,50 +1,221 @@
 from __future__ import annotations
 
 import json
+import math
 import re
-from typing import Any
+import threading
+from dataclasses import dataclass
+from typing import Any, Iterator
 
 import duckdb
 import pandas as pd
 
 READ_ONLY_PATTERN = re.compile(r"^\s*select\s", re.IGNORECASE)
 
+# Upper bound on rows produced by joins plus rows fed into sorts. Scans, filters, projections
+# and aggregates stream their input and are not charged.
+MAX_QUERY_COST = 50_000_000
+# Results estimated above this size are wrapped in a LIMIT before execution.
+MAX_RESULT_ROWS = 10_000
+# Queries still running after this many seconds are interrupted.
+QUERY_TIMEOUT_SECONDS = 10.0
+# Operators whose output can grow with the product of their inputs. DuckDB has no statistics for
+# registered frames, so its estimates for inequality joins are far too low to rely on.
+NESTED_LOOP_OPERATORS = {
+    "CROSS_PRODUCT",
+    "NESTED_LOOP_JOIN",
+    "BLOCKWISE_NL_JOIN",
+    "PIECEWISE_MERGE_JOIN",
+    "IE_JOIN",
+}
+HASH_JOIN_OPERATORS = {"HASH_JOIN"}
+EQUALITY_CONDITION = re.compile(r"^\(?\s*(.+?)\s*=\s*(.+?)\s*\)?$")
+SORT_OPERATORS = {"ORDER_BY", "WINDOW"}
+SINGLE_ROW_OPERATORS = {"UNGROUPED_AGGREGATE", "SIMPLE_AGGREGATE"}
+
 
 class QueryError(ValueError):
     pass
 
 
+class SQLError(QueryError):
+    """A query was rejected, could not be planned or failed while running."""
+
+
+@dataclass
+class QueryPlan:
+    query: str
+    estimated_rows: float
+    estimated_cost: float
+    limited: bool
+
+
 def validate_sql(query: str) -> None:
     if not READ_ONLY_PATTERN.match(query):
-        raise QueryError("Only SELECT queries are allowed.")
+        raise SQLError("Only SELECT queries are allowed.")
     if ";" in query.strip().strip(";"):
-        raise QueryError("Multiple statements are not allowed.")
+        raise SQLError("Multiple statements are not allowed.")
+
+
+def _join_keys(node: dict[str, Any]) -> list[tuple[str, str]]:
+    """Column names on each side of a hash join's equality conditions."""
+    info = node.get("extra_info")
+    conditions = info.get("Conditions", []) if isinstance(info, dict) else []
+    if isinstance(conditions, str):
+        conditions = [conditions]
+    keys = []
+    for condition in conditions:
+        match = EQUALITY_CONDITION.match(condition)
+        if match:
+            left, right = (side.split(".")[-1].strip('"') for side in match.groups())
+            keys.append((left, right))
+    return keys
+
+
+def _walk(node: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    yield node
+    for child in node.get("children", []):
+        yield from _walk(child)
+
+
+def _distinct_counts(conn: duckdb.DuckDBPyConnection, roots: list[dict[str, Any]]) -> dict:
+    """Approximate distinct counts of the dataset columns used as hash join keys."""
+    keys = {
+        column
+        for root in roots
+        for node in _walk(root)
+        if node.get("name") in HASH_JOIN_OPERATORS
+        for pair in _join_keys(node)
+        for column in pair
+    }
+    columns = [desc[0] for desc in conn.execute("SELECT * FROM dataset LIMIT 0").description]
+    keys = [column for column in columns if column in keys]
+    if not keys:
+        return {}
+    select = ", ".join(
+        'approx_count_distinct("{}")'.format(column.replace('"', '""')) for column in keys
+    )
+    return dict(zip(keys, conn.execute(f"SELECT {select} FROM dataset").fetchone()))
+
+
+def _hash_join_rows(node: dict[str, Any], child_rows: list[float], distinct: dict) -> float | None:
+    """Bound a hash join's output as |L| * |R| / distinct keys, assuming uniform keys."""
+    if len(child_rows) != 2:
+        return None
+    key_counts = []
+    for left, right in _join_keys(node):
+        counts = [distinct[column] for column in (left, right) if column in distinct]
+        if counts:
+            key_counts.append(max(max(counts), 1))
+    if not key_counts:
+        return None
+    keys = min(math.prod(key_counts), max(child_rows))
+    return math.prod(child_rows) / max(keys, 1)
+
+
+def _estimate(node: dict[str, Any], distinct: dict | None = None) -> tuple[float, float]:
+    """Return (estimated output rows, estimated join and sort rows) for an EXPLAIN JSON node."""
+    distinct = distinct or {}
+    children = [_estimate(child, distinct) for child in node.get("children", [])]
+    child_rows = [rows for rows, _ in children]
+    name = node.get("name", "")
+    info = node.get("extra_info")
+    estimate = info.get("Estimated Cardinality") if isinstance(info, dict) else None
+    bound = _hash_join_rows(node, child_rows, distinct) if name in HASH_JOIN_OPERATORS else None
+    if name in NESTED_LOOP_OPERATORS and child_rows:
+        rows = float(math.prod(child_rows))
+    elif bound is not None:
+        rows = max(bound, float(str(estimate).lstrip("~")) if estimate is not None else 0.0)
+    elif name in SINGLE_ROW_OPERATORS:
+        rows = 1.0
+    elif estimate is not None:
+        rows = float(str(estimate).lstrip("~"))
+    else:
+        rows = max(child_rows, default=0.0)
+    cost = sum(cost for _, cost in children)
+    if name in NESTED_LOOP_OPERATORS or name.endswith("JOIN"):
+        cost += rows
+    elif name in SORT_OPERATORS:
+        cost += sum(child_rows)
+    return rows, cost
+
+
+def plan_sql(conn: duckdb.DuckDBPyConnection, query: str) -> QueryPlan:
+    query = query.strip().rstrip(";")
+    try:
+        explain = conn.execute(f"EXPLAIN (FORMAT JSON) {query}").fetchall()
+        roots = json.loads(explain[0][1])
+        distinct = _distinct_counts(conn, roots)
+    except duckdb.Error as exc:
+        raise SQLError(f"The query could not be planned: {exc}") from exc
+    estimates = [_estimate(root, distinct) for root in roots]
+    rows = max((rows for rows, _ in estimates), default=0.0)
+    cost = sum(cost for _, cost in estimates)
+    if cost > MAX_QUERY_COST:
+        raise SQLError(
+            f"The query was rejected because its joins and sorts would handle about "
+            f"{cost:,.0f} rows (limit {MAX_QUERY_COST:,}). Join on selective equality keys "
+            "rather than inequalities or low-cardinality columns, filter or aggregate each "
+            "side before joining, and avoid ORDER BY or window functions over the full "
+            "table, then try again."
+        )
+    if rows > MAX_RESULT_ROWS:
+        # One extra row lets run_sql tell whether the limit actually cut anything off.
+        limited_query = f"SELECT * FROM (\n{query}\n) AS limited LIMIT {MAX_RESULT_ROWS + 1}"
+        return QueryPlan(limited_query, rows, cost, limited=True)
+    return QueryPlan(query, rows, cost, limited=False)
 
 
 def run_sql(df: pd.DataFrame, query: str, limit: int = 200) -> dict[str, Any]:
     validate_sql(query)
     conn = duckdb.connect(database=":memory:")
     conn.register("dataset", df)
+    # Backstop for queries the planner underestimates.
+    timer = threading.Timer(QUERY_TIMEOUT_SECONDS, conn.interrupt)
+    timer.start()
     try:
-        result = conn.execute(query).fetchdf()
+        plan = plan_sql(conn, query)
+        result = conn.execute(plan.query).fetchdf()
+    except duckdb.InterruptException as exc:
+        raise SQLError(
+            f"The query was stopped after {QUERY_TIMEOUT_SECONDS:g} seconds. Filter or "
+            "aggregate the data before joining or sorting, then try again."
+        ) from exc
+    except duckdb.Error as exc:
+        raise SQLError(f"The query failed: {exc}") from exc
     finally:
+        timer.cancel()
         conn.close()
+    truncated = plan.limited and len(result) > MAX_RESULT_ROWS
+    if truncated:
+        result = result.head(MAX_RESULT_ROWS)
     preview = result.head(limit)
     return {
         "columns": list(preview.columns),
         "rows": preview.fillna("").to_dict(orient="records"),
         "row_count": len(result),
+        "truncated": truncated,
     }
 
 
-def summarize_dataframe(df: pd.DataFrame) -> dict[str, Any]:
-    numeric = df.select_dtypes(include="number")
+def summarize_profile(profile: dict[str, Any]) -> dict[str, Any]:
+    """Build the ``summarize_dataframe`` result from stats stored at profiling time."""
     summary = {}
-    if not numeric.empty:
-        summary = numeric.describe().to_dict()
+    for col in profile["columns"]:
+        stats = col["stats"]
+        if not stats or col["dtype"] == "bool":
+            continue
+        summary[col["name"]] = {
+            "count": float(stats["count"]),
+            "mean": stats["mean"],
+            "std": stats["std"],
+            "min": stats["min"],
+            **stats["quantiles"],
+            "max": stats["max"],
+        }
     return {
-        "row_count": len(df),
-        "column_count": len(df.columns),
+        "row_count": profile["row_count"],
+        "column_count": profile["column_count"],
         "numeric_summary": summary,
     }
 
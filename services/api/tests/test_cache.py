@@ -0,0 +1,74 @@
+import os
+from collections import OrderedDict
+
+import pandas as pd
+import pytest
+
+from app import cache
+from app.profiling import read_dataset
+
+
+def test_read_dataset_shares_cached_table(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(cache, "_mapped", OrderedDict())
+    path = tmp_path / "data.csv"
+    pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]}).to_csv(path, index=False)
+
+    first = read_dataset(str(path))
+    cache._mapped.clear()
+    second = cache.read_cached(str(path), _fail_parse)
+
+    assert first.equals(second)
+    assert len(list((tmp_path / "cache").glob("*.arrow"))) == 1
+
+
+def test_changed_source_evicts_stale_entry(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(cache, "_mapped", OrderedDict())
+    path = tmp_path / "data.csv"
+    pd.DataFrame({"a": [1]}).to_csv(path, index=False)
+    read_dataset(str(path))
+    pd.DataFrame({"a": [1, 2]}).to_csv(path, index=False)
+    os.utime(path, ns=(0, 0))
+
+    df = read_dataset(str(path))
+
+    assert len(df) == 2
+    assert len(list((tmp_path / "cache").glob("*.arrow"))) == 1
+    assert len(list((tmp_path / "cache").glob("*.lock"))) <= cache.BUILD_LOCKS + 1
+
+
+def test_lru_release_lets_idle_files_be_evicted(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(cache, "_mapped", OrderedDict())
+    monkeypatch.setattr(cache, "MAX_MAPPED", 1)
+    monkeypatch.setattr(cache, "MAX_CACHE_BYTES", 0)
+    paths = [tmp_path / f"data{i}.csv" for i in range(2)]
+    for path in paths:
+        pd.DataFrame({"a": [1, 2]}).to_csv(path, index=False)
+        read_dataset(str(path))
+
+    assert list(cache._mapped) == [os.path.abspath(paths[1])]
+    assert len(list((tmp_path / "cache").glob("*.arrow"))) == 1
+
+
+def test_cached_frames_are_read_only_and_keep_column_names(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(cache, "_mapped", OrderedDict())
+    csv_path = tmp_path / "data.csv"
+    json_path = tmp_path / "data.json"
+    pd.DataFrame({"a": [1, 2]}).to_csv(csv_path, index=False)
+    json_path.write_text("[[1, 2], [3, 4]]")
+
+    df = read_dataset(str(csv_path))
+    with pytest.raises(ValueError, match="read-only"):
+        df.loc[0, "a"] = 5
+    writable = df.copy()
+    writable.loc[0, "a"] = 5
+
+    assert list(read_dataset(str(json_path)).columns) == [0, 1]
+    assert len(list((tmp_path / "cache").glob("*.arrow"))) == 1
+
+
+def _fail_parse(path):
+    raise AssertionError("dataset was parsed again")
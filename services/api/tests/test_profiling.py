@@ -1,6 +1,8 @@
 import pandas as pd
+import pytest
 
-from app.profiling import profile_dataframe
+from app.profiling import profile_dataframe, profile_is_current
+from app.tools import summarize_profile
 
 
 def test_profile_dataframe_basic():
@@ -10,3 +12,19 @@ def test_profile_dataframe_basic():
     assert profile["column_count"] == 2
     assert profile["columns"][0]["missing"] == 1
     assert profile["data_health"]["duplicates"] == 0
+
+
+def test_profile_dataframe_matches_describe(tmp_path):
+    path = tmp_path / "data.csv"
+    df = pd.DataFrame({"a": range(1, 1001), "b": ["x"] * 1000})
+    df.to_csv(path, index=False)
+    profile = profile_dataframe(df, str(path))
+    expected = df.describe()["a"]
+    summary = summarize_profile(profile)["numeric_summary"]["a"]
+
+    assert list(summary) == list(expected.index)
+    assert summary["std"] == pytest.approx(expected["std"])
+    assert summary["50%"] == pytest.approx(expected["50%"], rel=0.01)
+    assert profile_is_current(profile, str(path))
+    path.write_text("a\n1\n")
+    assert not profile_is_current(profile, str(path))
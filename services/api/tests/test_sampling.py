@@ -0,0 +1,173 @@
+import json
+import math
+
+import pandas as pd
+import pytest
+
+from app.db import Sample
+from app.profiling import profile_dataframe
+from app.sampling import (
+    MIN_SAMPLE_ROWS,
+    build_samples,
+    choose_sample,
+    current_samples,
+    pick_strata_column,
+    sampled_query,
+    scale_result,
+)
+from app.tools import run_sql
+
+
+def _source(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("")
+    return str(path)
+
+
+def test_build_samples_keeps_every_stratum(tmp_path):
+    rows = MIN_SAMPLE_ROWS * 100
+    df = pd.DataFrame({"category": ["A"] * (rows - 5) + ["B"] * 5, "value": range(rows)})
+    profile = profile_dataframe(df)
+    samples = build_samples(df, profile, _source(tmp_path))
+
+    assert pick_strata_column(profile) == "category"
+    assert {(s["kind"], s["fraction"]) for s in samples} == {
+        ("uniform", 0.01),
+        ("stratified", 0.01),
+    }
+    stratified = next(s for s in samples if s["kind"] == "stratified")
+    assert set(pd.read_parquet(stratified["path"])["category"]) == {"A", "B"}
+    assert stratified["weights"]["B"] == 5
+
+
+def test_build_samples_skips_small_datasets(tmp_path):
+    df = pd.DataFrame({"value": range(100)})
+    assert build_samples(df, profile_dataframe(df), _source(tmp_path)) == []
+
+
+def test_build_samples_skips_mixed_type_columns(tmp_path):
+    rows = MIN_SAMPLE_ROWS * 100
+    df = pd.DataFrame({"mixed": [1 if i % 2 else "x" for i in range(rows)]})
+    assert build_samples(df, profile_dataframe(df), _source(tmp_path)) == []
+    assert not list(tmp_path.glob("*.parquet"))
+
+
+def test_choose_sample_prefers_stratified_for_group_by():
+    uniform = Sample("u", "d", "uniform", 0.01, None, "u.parquet", 100, None, "{}")
+    stratified = Sample("s", "d", "stratified", 0.01, "category", "s.parquet", 101, "{}", "{}")
+    small = Sample("x", "d", "uniform", 0.001, None, "x.parquet", 10, None, "{}")
+    samples = [uniform, stratified, small]
+
+    grouped = "SELECT category, COUNT(*) FROM dataset GROUP BY category"
+    assert choose_sample(samples, grouped) is stratified
+    assert choose_sample(samples, "SELECT AVG(value) FROM dataset") is uniform
+    assert choose_sample(samples, "SELECT COUNT(*) FROM dataset GROUP BY category") is uniform
+    assert choose_sample([], "SELECT 1") is None
+
+
+def test_choose_sample_runs_unscalable_queries_on_full_data():
+    samples = [Sample("u", "d", "uniform", 0.01, None, "u.parquet", 100, None, "{}")]
+
+    assert (
+        choose_sample(samples, "SELECT COUNT(*), MIN(value) FROM dataset WHERE id > 5") is not None
+    )
+    for query in [
+        "SELECT ROUND(SUM(value)) FROM dataset",
+        "SELECT COUNT(*) FROM (SELECT DISTINCT category FROM dataset) t",
+        "SELECT category, COUNT(*) FROM dataset GROUP BY category HAVING COUNT(*) > 10",
+        "SELECT * FROM dataset WHERE id = 5",
+        "SELECT value FROM dataset WHERE id = 5",
+        "SELECT COUNT(DISTINCT category) FROM dataset",
+        "SELECT COUNT(*) FROM dataset WHERE id IN (SELECT id FROM dataset LIMIT 5)",
+        "",
+    ]:
+        assert choose_sample(samples, query) is None, query
+
+
+def test_scale_result_uses_stratum_weights(tmp_path):
+    rows = MIN_SAMPLE_ROWS * 100
+    df = pd.DataFrame({"category": ["A"] * (rows - 5) + ["B"] * 5, "value": [1] * rows})
+    stratified = next(
+        s
+        for s in build_samples(df, profile_dataframe(df), _source(tmp_path))
+        if s["kind"] == "stratified"
+    )
+    sample = Sample(
+        id="s",
+        dataset_id="d",
+        kind="stratified",
+        fraction=0.01,
+        strata_column="category",
+        path=stratified["path"],
+        row_count=stratified["row_count"],
+        weights_json=json.dumps(stratified["weights"]),
+        source_json=json.dumps(stratified["source"]),
+    )
+    query = "SELECT category, COUNT(*) AS n, SUM(value) AS total, AVG(value) AS avg FROM dataset "
+    query += "GROUP BY category ORDER BY category"
+    result = run_sql(pd.read_parquet(sample.path), sampled_query(query))
+
+    assert scale_result(result, sample, query, rows) == ["n", "total"]
+    assert result["columns"] == ["category", "n", "total", "avg"]
+    assert [row["n"] for row in result["rows"]] == [rows - 5, 5]
+    assert [row["total"] for row in result["rows"]] == [rows - 5, 5]
+    assert [row["avg"] for row in result["rows"]] == [1, 1]
+    # Stratum B keeps one of its 5 rows, so its single row has weight 5.
+    assert result["standard_errors"][1] == {"n": math.sqrt(20), "total": math.sqrt(20)}
+
+
+def test_scale_result_uses_uniform_weight():
+    sample = Sample("u", "d", "uniform", 0.01, None, "u.parquet", 10, None, "{}")
+    result = run_sql(pd.DataFrame({"x": range(10)}), "SELECT COUNT(*), MAX(x) FROM dataset")
+
+    assert scale_result(result, sample, "SELECT COUNT(*), MAX(x) FROM dataset", 1000) == [
+        result["columns"][0]
+    ]
+    assert list(result["rows"][0].values()) == [1000, 9]
+    assert result["standard_errors"] == [{result["columns"][0]: pytest.approx(math.sqrt(99_000))}]
+
+
+def test_standard_errors_cover_sampled_sums():
+    population = pd.DataFrame({"value": range(100_000)})
+    query = "SELECT SUM(value) AS total FROM dataset"
+    errors = []
+    for seed in range(20):
+        drawn = population.sample(frac=0.01, random_state=seed)
+        sample = Sample("u", "d", "uniform", 0.01, None, "u.parquet", len(drawn), None, "{}")
+        result = run_sql(drawn, sampled_query(query))
+        scale_result(result, sample, query, len(population))
+        assert result["columns"] == ["total"]
+        total = result["rows"][0]["total"]
+        errors.append(
+            abs(total - population["value"].sum()) / result["standard_errors"][0]["total"]
+        )
+
+    assert sum(error <= 2 for error in errors) >= 17
+
+
+def test_reupload_invalidates_old_samples(tmp_path):
+    path = tmp_path / "data.csv"
+    df = pd.DataFrame({"value": range(MIN_SAMPLE_ROWS * 100)})
+    df.to_csv(path, index=False)
+    built = build_samples(df, profile_dataframe(df), str(path))
+    samples = [
+        Sample(
+            id=str(i),
+            dataset_id="d",
+            kind=s["kind"],
+            fraction=s["fraction"],
+            strata_column=None,
+            path=s["path"],
+            row_count=s["row_count"],
+            weights_json=None,
+            source_json=json.dumps(s["source"]),
+        )
+        for i, s in enumerate(built)
+    ]
+    assert current_samples(samples, str(path)) == samples
+
+    small = pd.DataFrame({"value": range(10)})
+    small.to_csv(path, index=False)
+    assert build_samples(small, profile_dataframe(small), str(path)) == []
+    assert current_samples(samples, str(path)) == []
+    assert not list(tmp_path.glob("*.parquet"))
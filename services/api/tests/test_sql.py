@@ -1,7 +1,9 @@
+import duckdb
 import pandas as pd
 import pytest
 
-from app.tools import QueryError, run_sql
+from app import tools
+from app.tools import MAX_RESULT_ROWS, QueryError, run_sql
 
 
 def test_run_sql_select():
@@ -15,3 +17,67 @@ def test_run_sql_rejects_non_select():
     df = pd.DataFrame({"x": [1]})
     with pytest.raises(QueryError):
         run_sql(df, "DELETE FROM dataset")
+
+
+def test_run_sql_rejects_expensive_cross_join():
+    df = pd.DataFrame({"x": range(10_000)})
+    with pytest.raises(QueryError, match="selective equality keys"):
+        run_sql(df, "SELECT * FROM dataset a, dataset b")
+
+
+def test_run_sql_limits_large_results():
+    df = pd.DataFrame({"x": range(MAX_RESULT_ROWS * 2)})
+    result = run_sql(df, "SELECT * FROM dataset;")
+    assert result["row_count"] == MAX_RESULT_ROWS
+    assert result["truncated"] is True
+
+
+def test_run_sql_reports_planning_errors():
+    df = pd.DataFrame({"x": [1]})
+    with pytest.raises(QueryError, match="could not be planned"):
+        run_sql(df, "SELECT missing FROM dataset")
+
+
+def test_run_sql_does_not_charge_scans_or_aggregates(monkeypatch):
+    monkeypatch.setattr(tools, "MAX_QUERY_COST", 100)
+    df = pd.DataFrame({"g": [1, 2] * (MAX_RESULT_ROWS * 2)})
+    total = run_sql(df, "SELECT COUNT(*) AS n FROM dataset")
+    grouped = run_sql(df, "SELECT g, COUNT(*) AS n FROM dataset GROUP BY g")
+    assert total["rows"] == [{"n": MAX_RESULT_ROWS * 4}]
+    assert grouped["row_count"] == 2
+    with pytest.raises(QueryError):
+        run_sql(df, "SELECT * FROM dataset ORDER BY g")
+
+
+def test_plan_sql_does_not_limit_aggregates():
+    conn = duckdb.connect(database=":memory:")
+    conn.register("dataset", pd.DataFrame({"x": range(MAX_RESULT_ROWS * 2)}))
+    plan = tools.plan_sql(conn, "SELECT SUM(x) FROM dataset")
+    conn.close()
+    assert not plan.limited
+
+
+def test_run_sql_rejects_low_cardinality_self_join():
+    df = pd.DataFrame({"g": [0, 1] * 10_000})
+    with pytest.raises(QueryError, match="joins and sorts"):
+        run_sql(df, "SELECT COUNT(*) FROM dataset a JOIN dataset b ON a.g = b.g")
+
+
+def test_run_sql_rejects_inequality_self_join():
+    df = pd.DataFrame({"x": range(10_000)})
+    with pytest.raises(QueryError, match="joins and sorts"):
+        run_sql(df, "SELECT COUNT(*) FROM dataset a, dataset b WHERE a.x < b.x")
+
+
+def test_run_sql_allows_selective_self_join():
+    df = pd.DataFrame({"id": range(10_000)})
+    result = run_sql(df, "SELECT COUNT(*) AS n FROM dataset a JOIN dataset b ON a.id = b.id")
+    assert result["rows"] == [{"n": 10_000}]
+
+
+def test_run_sql_interrupts_slow_queries(monkeypatch):
+    monkeypatch.setattr(tools, "QUERY_TIMEOUT_SECONDS", 0.01)
+    monkeypatch.setattr(tools, "MAX_QUERY_COST", float("inf"))
+    df = pd.DataFrame({"x": range(20_000)})
+    with pytest.raises(QueryError, match="stopped after"):
+        run_sql(df, "SELECT COUNT(*) FROM dataset a, dataset b WHERE a.x < b.x + 1")